@@ -0,0 +1,533 @@
+"""Fault-injection harness for the recovery paths of run_nodepay().
+
+Runs the real main loop from main.py against an in-process stand-in browser that
+serves local stand-in pages (site, dashboard and extension page). Once the loop has
+verified the extension as 'Connected' and gone idle, one fault is injected and the
+harness measures the detection latency (until the loop logs a warning or error about
+it) and the repair latency (from there until the extension is verified 'Connected'
+again), counting any restarts the fault forces on the way. Restarts are simulated the
+way the container restarts main.py (which itself never gives up); the harness stops
+a run after --max-restarts as its own cutoff. Session faults can be kept active across
+restarts to exercise repeated restarts.
+
+Usage (from nodepay_src/):
+    python fault_harness.py                       # all faults, loop timings x0.05
+    python fault_harness.py --scale 1             # real loop timings (slow)
+    python fault_harness.py --repeat 5 --no-jitter    # min/median/max over 5 runs
+    python fault_harness.py --faults main_tab_lost,connecting_stuck --verbose
+    python fault_harness.py --faults connecting_stuck:3   # outlives the harness cutoff (expected)
+"""
+import os
+import re
+import time
+import random
+import statistics
+import logging
+import argparse
+import tempfile
+import functools
+from unittest import mock
+from selenium.common.exceptions import (
+    NoSuchElementException, NoSuchWindowException, WebDriverException
+)
+
+import main
+
+# --- Harness Settings ---
+HARNESS_NP_KEY = 'harness-np-key'
+HARNESS_EXTENSION_ID = 'harnessextensionid'
+HARNESS_EXTENSION_URL = 'http://nodepay.local/'
+DEFAULT_TIME_SCALE = 0.05 # Multiplier applied to the loop timing constants
+DEFAULT_SEED = 0 # Seed for the schedule jitter and click pauses, so runs are reproducible
+MAX_RESTARTS_PER_FAULT = 3 # Default for --max-restarts: harness cutoff, main.py/the container never give up
+# Default render delay of the 'slow_responses' fault (scaled like the loop timings). The loop tolerates
+# about MEDIUM_WAIT + SHORT_WAIT (15s) after a refresh, so this one has to be recovered from.
+SLOW_PAGE_DELAY_SECONDS = 20
+# Timing constants of main.py scaled by --scale (every wait and pause in main.py reads one of these)
+SCALED_TIMING_CONSTANTS = (
+    'DEFAULT_WAIT_TIMEOUT', 'CHECK_CLAIM_INTERVAL_MINUTES', 'CHECK_EXTENSION_INTERVAL_MINUTES',
+    'MAIN_LOOP_SLEEP_SECONDS', 'MIN_LOOP_SLEEP_SECONDS', 'SCHEDULE_JITTER_SECONDS', 'RESTART_DELAY_SECONDS',
+    'CONNECTING_WAIT_TIMEOUT_SECONDS', 'SHORT_WAIT', 'MEDIUM_WAIT', 'LONG_WAIT',
+    'CLAIM_BUTTON_WAIT_TIMEOUT', 'CLICK_PAUSE_RANGE_SECONDS'
+)
+WEBDRIVER_WAIT_POLL_SECONDS = 0.5 # Selenium's default WebDriverWait poll_frequency, scaled with the rest
+
+harness_log = logging.getLogger('fault_harness')
+
+
+class HarnessStop(BaseException):
+    """Raised to unwind run_nodepay() once a trial is over (not caught by 'except Exception')."""
+
+
+# --- Stand-in Browser ---
+
+class StandInElement:
+    """Element found on a stand-in page."""
+
+    def __init__(self, driver, text):
+        self._driver = driver
+        self.text = text
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        self._driver.click_text(self.text)
+
+
+class StandInSwitchTo:
+    """Mimics driver.switch_to for the stand-in driver."""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver.check_session()
+        if self._driver.fail_next_switch:
+            self._driver.fail_next_switch = False
+            raise NoSuchWindowException("no such window: target window already closed (injected)")
+        if handle not in self._driver.windows:
+            raise NoSuchWindowException(f"no such window: {handle}")
+        self._driver.current = handle
+
+    def new_window(self, type_hint=None):
+        self._driver.check_session()
+        self._driver.current = self._driver.open_window()
+
+
+class StandInDriver:
+    """Minimal WebDriver stand-in covering the calls made by run_nodepay().
+
+    Pages are rendered from the trial's URLs: the dashboard shows 'Dashboard' (and
+    'Claim' until clicked), the extension page shows 'Activated' plus the current
+    connection status. Every call checks the trial deadline so a stuck loop ends.
+    """
+
+    def __init__(self, trial):
+        self.trial = trial
+        self.capabilities = {'chrome': {'chromedriverVersion': 'stand-in'}}
+        self.switch_to = StandInSwitchTo(self)
+        self.windows = {} # handle -> url
+        self.loaded_at = {} # handle -> time of the last load
+        self.local_storage = {}
+        self.handle_seq = 0
+        # Fault switches
+        self.extension_status = 'Connected'
+        self.claim_available = True
+        self.page_delay = 0
+        self.session_broken = False
+        self.fail_next_switch = False
+        self.fail_next_refresh = False
+        self.quit_called = False
+        self.current = self.open_window()
+
+    def open_window(self):
+        self.handle_seq += 1
+        handle = f"STANDIN-{self.handle_seq:04d}"
+        self.windows[handle] = 'about:blank'
+        self.loaded_at[handle] = time.time()
+        return handle
+
+    def check_session(self):
+        self.trial.check_deadline()
+        if self.session_broken or self.quit_called:
+            raise WebDriverException("invalid session id")
+
+    def require_window(self):
+        self.check_session()
+        if self.current not in self.windows:
+            raise NoSuchWindowException("no such window: target window already closed")
+
+    def find_window(self, predicate):
+        """Returns the first open handle whose URL matches, or None."""
+        return next((h for h, url in self.windows.items() if predicate(url)), None)
+
+    def page_texts(self):
+        url = self.windows[self.current]
+        if time.time() - self.loaded_at[self.current] < self.page_delay:
+            return [] # Still rendering
+        if url == self.trial.dashboard_url:
+            return ['Dashboard', 'Claim'] if self.claim_available else ['Dashboard']
+        if url == self.trial.extension_page:
+            return ['Activated', self.extension_status]
+        return []
+
+    # --- WebDriver API used by main.py ---
+
+    @property
+    def window_handles(self):
+        self.check_session()
+        return list(self.windows)
+
+    @property
+    def current_window_handle(self):
+        self.require_window()
+        return self.current
+
+    @property
+    def current_url(self):
+        self.require_window()
+        return self.windows[self.current]
+
+    def get(self, url):
+        self.require_window()
+        self.windows[self.current] = url
+        self.loaded_at[self.current] = time.time()
+
+    def refresh(self):
+        self.require_window()
+        if self.fail_next_refresh:
+            self.fail_next_refresh = False
+            raise WebDriverException("disconnected: not connected to DevTools (injected)")
+        self.loaded_at[self.current] = time.time()
+
+    def close(self):
+        self.require_window()
+        del self.windows[self.current]
+        del self.loaded_at[self.current]
+
+    def quit(self):
+        self.check_session()
+        self.quit_called = True
+
+    def execute_script(self, script, *args):
+        self.require_window()
+        set_item = re.search(r"localStorage\.setItem\('([^']*)', '(.*)'\)", script)
+        get_item = re.search(r"localStorage\.getItem\('([^']*)'\)", script)
+        if set_item:
+            self.local_storage[set_item.group(1)] = set_item.group(2).replace("\\'", "'")
+        elif get_item:
+            return self.local_storage.get(get_item.group(1))
+        elif 'click()' in script and args:
+            args[0].click()
+        return None
+
+    def find_element(self, by, value):
+        self.require_window()
+        exact = re.search(r"text\(\)='([^']*)'", value)
+        partial = re.search(r"contains\(text\(\), '([^']*)'\)", value)
+        for text in self.page_texts():
+            if (exact and text == exact.group(1)) or (partial and partial.group(1) in text):
+                return StandInElement(self, text)
+        raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+
+    def click_text(self, text):
+        self.require_window()
+        if text == 'Claim':
+            self.claim_available = False
+
+
+# --- Faults ---
+
+def fault_main_tab_lost(driver):
+    handle = driver.find_window(lambda url: url != driver.trial.extension_page)
+    del driver.windows[handle]
+
+def fault_extension_tab_vanished(driver):
+    handle = driver.find_window(lambda url: url == driver.trial.extension_page)
+    del driver.windows[handle]
+
+def fault_switch_back_lost(driver):
+    # Leave focus on the extension tab so the loop has to switch back, then fail that switch
+    driver.current = driver.find_window(lambda url: url == driver.trial.extension_page)
+    driver.fail_next_switch = True
+
+def fault_webdriver_error_mid_check(driver):
+    driver.fail_next_refresh = True
+
+def fault_status_disconnected(driver):
+    driver.extension_status = 'Disconnected'
+
+def fault_connecting_stuck(driver):
+    driver.extension_status = 'Connecting...'
+
+def fault_slow_responses(driver):
+    driver.page_delay = driver.trial.slow_delay * driver.trial.scale
+
+def fault_session_broken(driver):
+    driver.session_broken = True
+
+# Faults that are a state of the browser session and can be carried into a restarted session
+SESSION_FAULTS = ('status_disconnected', 'connecting_stuck', 'slow_responses', 'session_broken')
+
+FAULTS = {
+    'main_tab_lost': fault_main_tab_lost,
+    'extension_tab_vanished': fault_extension_tab_vanished,
+    'switch_back_lost': fault_switch_back_lost,
+    'webdriver_error_mid_check': fault_webdriver_error_mid_check,
+    'status_disconnected': fault_status_disconnected,
+    'connecting_stuck': fault_connecting_stuck,
+    'slow_responses': fault_slow_responses,
+    'session_broken': fault_session_broken,
+}
+
+
+# --- Trial Runner ---
+
+class FaultTrial:
+    """Tracks one fault from warm-up through injection to recovery."""
+
+    def __init__(self, name, scale, timeout, persist_restarts=0, max_restarts=MAX_RESTARTS_PER_FAULT,
+                 slow_delay=SLOW_PAGE_DELAY_SECONDS):
+        self.name = name
+        self.scale = scale
+        self.slow_delay = slow_delay
+        self.persist_restarts = persist_restarts
+        self.max_restarts = max_restarts
+        self.inject = FAULTS[name]
+        self.deadline = time.time() + timeout
+        self.dashboard_url = f"{HARNESS_EXTENSION_URL}dashboard"
+        self.extension_page = f"chrome-extension://{HARNESS_EXTENSION_ID}/index.html"
+        self.driver = None
+        # -> 'armed' -> 'injected' -> 'recovered' ('absorbed' if never noticed, 'cut_off' at the restart cutoff)
+        self.state = 'warming_up'
+        self.injected_at = None
+        self.detected_at = None
+        self.recovered_at = None
+        self.restarts = 0
+        self.error = None
+
+    @property
+    def cutoff_expected(self):
+        """True if the fault was told to outlive the harness restart cutoff."""
+        return self.persist_restarts >= self.max_restarts
+
+    @property
+    def passed(self):
+        return self.state in ('recovered', 'absorbed') or (self.state == 'cut_off' and self.cutoff_expected)
+
+    def create_driver(self, options=None):
+        """Replaces webdriver.Chrome(); restarted sessions are healthy unless the fault persists."""
+        self.driver = StandInDriver(self)
+        if self.state == 'injected' and self.restarts <= self.persist_restarts:
+            self.inject(self.driver)
+            harness_log.info(f"[{self.name}] Fault carried into restarted session ({self.restarts}/{self.persist_restarts}).")
+        return self.driver
+
+    def check_deadline(self):
+        if time.time() > self.deadline:
+            raise HarnessStop(f"Timeout while {self.state}")
+
+    def on_connection_verified(self):
+        if self.state == 'warming_up':
+            self.state = 'armed'
+        elif self.state == 'injected' and self.detected_at is None:
+            # Connected again without the loop ever logging a problem: the fault had no observable effect
+            self.state = 'absorbed'
+            raise HarnessStop("No fault observed")
+        elif self.state == 'injected':
+            self.state = 'recovered'
+            self.recovered_at = time.time()
+            raise HarnessStop("Recovered")
+
+    def on_loop_warning(self):
+        if self.state == 'injected' and self.detected_at is None:
+            self.detected_at = time.time()
+
+    def on_loop_idle(self):
+        if self.state == 'armed':
+            self.inject(self.driver)
+            self.injected_at = time.time()
+            self.state = 'injected'
+            harness_log.info(f"[{self.name}] Fault injected.")
+
+
+class LoopClock:
+    """Stands in for the time module inside main.py to inject faults once the loop sleeps."""
+
+    def __init__(self, trial):
+        self._trial = trial
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def sleep(self, seconds):
+        self._trial.on_loop_idle()
+        time.sleep(seconds)
+
+
+class LoopWarningWatcher(logging.Handler):
+    """Marks the fault as detected on the first warning or error logged by main.py after injection."""
+
+    def __init__(self, trial):
+        super().__init__(level=logging.WARNING)
+        self._trial = trial
+
+    def emit(self, record):
+        if record.name == 'root': # main.py logs through the root logger
+            self._trial.on_loop_warning()
+
+
+def scale_timing(value, scale):
+    """Scales a timing constant, which is either a number or a (min, max) tuple."""
+    if isinstance(value, tuple):
+        return tuple(v * scale for v in value)
+    return value * scale
+
+
+def run_trial(name, scale, timeout, seed, jitter=True, persist_restarts=0, max_restarts=MAX_RESTARTS_PER_FAULT,
+              slow_delay=SLOW_PAGE_DELAY_SECONDS):
+    """Runs run_nodepay() (restarting it like the container would) until the fault is recovered."""
+    trial = FaultTrial(name, scale, timeout, persist_restarts, max_restarts, slow_delay)
+    random.seed(seed)
+    watcher = LoopWarningWatcher(trial)
+    original_verify = main.verify_extension_connection
+
+    def verify_and_record(driver):
+        connected = original_verify(driver)
+        if connected:
+            trial.on_connection_verified()
+        return connected
+
+    with tempfile.TemporaryDirectory() as config_dir, mock.patch.dict(os.environ, {
+        'NP_KEY': HARNESS_NP_KEY, 'EXTENSION_ID': HARNESS_EXTENSION_ID, 'EXTENSION_URL': HARNESS_EXTENSION_URL
+    }):
+        dotenv_path = os.path.join(config_dir, '.env')
+        with open(dotenv_path, 'w') as f:
+            f.write(f"NP_KEY={HARNESS_NP_KEY}\n")
+        open(os.path.join(config_dir, f'{HARNESS_EXTENSION_ID}.crx'), 'wb').close()
+
+        patches = [
+            mock.patch.object(main, 'DOTENV_PATH', dotenv_path),
+            mock.patch.object(main, 'EXTENSION_CRX_DIR', config_dir),
+            mock.patch.object(main, 'CLAIM_SCHEDULE_STATE_FILE', os.path.join(config_dir, 'claim_schedule_state.json')),
+            mock.patch.object(main, 'EXTENSION_SCHEDULE_STATE_FILE', os.path.join(config_dir, 'extension_schedule_state.json')),
+            mock.patch.object(main, 'next_claim_check_time', 0),
+            mock.patch.object(main, 'next_extension_check_time', 0),
+            mock.patch.object(main.webdriver, 'Chrome', trial.create_driver),
+            mock.patch.object(main, 'verify_extension_connection', verify_and_record),
+            mock.patch.object(main, 'time', LoopClock(trial)),
+            mock.patch.object(main, 'WebDriverWait',
+                              functools.partial(main.WebDriverWait, poll_frequency=WEBDRIVER_WAIT_POLL_SECONDS * scale)),
+        ]
+        patches += [mock.patch.object(main, const, scale_timing(getattr(main, const), scale)) for const in SCALED_TIMING_CONSTANTS]
+        if not jitter:
+            patches.append(mock.patch.object(main, 'SCHEDULE_JITTER_SECONDS', 0))
+        for patch in patches:
+            patch.start()
+        logging.getLogger().addHandler(watcher)
+        try:
+            while True:
+                try:
+                    finished = main.run_nodepay()
+                except HarnessStop as stop:
+                    if trial.state not in ('recovered', 'absorbed'):
+                        trial.error = str(stop)
+                    break
+                if finished:
+                    raise KeyboardInterrupt # run_nodepay() swallowed a Ctrl+C
+                if trial.state != 'injected':
+                    trial.error = f"run_nodepay() failed while {trial.state}"
+                    break
+                if trial.restarts >= trial.max_restarts:
+                    trial.state = 'cut_off'
+                    expected = " (expected, fault persists)" if trial.cutoff_expected else ""
+                    trial.error = f"Harness cutoff after {trial.restarts} restarts{expected}"
+                    break
+                trial.restarts += 1
+                harness_log.info(f"[{name}] run_nodepay() exited, restarting ({trial.restarts}/{trial.max_restarts})...")
+                time.sleep(main.RESTART_DELAY_SECONDS)
+        finally:
+            logging.getLogger().removeHandler(watcher)
+            for patch in reversed(patches):
+                patch.stop()
+    return trial
+
+
+def format_spread(values):
+    """Formats latencies as min/median/max, or '-' if there are none."""
+    if not values:
+        return '-'
+    return f"{min(values):.2f}/{statistics.median(values):.2f}/{max(values):.2f}"
+
+
+def print_report(results, scale, seed, jitter, repeat):
+    print()
+    print(f"Recovery report (loop timings x{scale:g}, seed {seed}, jitter {'on' if jitter else 'off'}, "
+          f"{repeat} run(s) per fault)")
+    print("Latencies in seconds as min/median/max. Detect: injection until the loop logs the fault. "
+          "Repair: from there until 'Connected' again.")
+    print(f"{'Fault':<34} {'OK':>5}  {'Detect':<20} {'Repair':<20} {'Total':<20} {'Restarts':>8}  Notes")
+    for name, trials in results.items():
+        recovered = [t for t in trials if t.state == 'recovered']
+        absorbed = [t for t in trials if t.state == 'absorbed']
+        detect = format_spread([t.detected_at - t.injected_at for t in recovered])
+        repair = format_spread([t.recovered_at - t.detected_at for t in recovered])
+        total = format_spread([t.recovered_at - t.injected_at for t in recovered])
+        restarts = sorted({t.restarts for t in trials})
+        restarts = str(restarts[0]) if len(restarts) == 1 else f"{restarts[0]}-{restarts[-1]}"
+        notes = sorted({t.error for t in trials if t.error})
+        if recovered and not notes:
+            notes = ['in-loop' if all(t.restarts == 0 for t in recovered) else 'via restart']
+        if absorbed:
+            notes.append(f"{len(absorbed)} run(s): no fault observed")
+        ok = f"{len(recovered)}/{len(trials)}"
+        print(f"{name:<34} {ok:>5}  {detect:<20} {repair:<20} {total:<20} {restarts:>8}  {'; '.join(notes)}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Inject faults into the Nodepay main loop and report recovery times.")
+    parser.add_argument('--faults', default=','.join(FAULTS),
+                        help=f"Comma-separated faults to run (default: all), optionally as name:N to keep a session "
+                             f"fault active for N restarts. Available: {', '.join(FAULTS)}")
+    parser.add_argument('--scale', type=float, default=DEFAULT_TIME_SCALE,
+                        help=f"Multiplier for the loop timing constants in main.py (default: {DEFAULT_TIME_SCALE})")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per fault, reported as min/median/max (default: 1)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f"Seed for the random schedule jitter and click pauses (default: {DEFAULT_SEED})")
+    parser.add_argument('--no-jitter', action='store_true', help="Set SCHEDULE_JITTER_SECONDS to 0 during trials")
+    parser.add_argument('--persist-restarts', type=int, default=0,
+                        help=f"Keep session faults ({', '.join(SESSION_FAULTS)}) active for N restarts (default: 0)")
+    parser.add_argument('--max-restarts', type=int, default=MAX_RESTARTS_PER_FAULT,
+                        help=f"Harness cutoff: stop a run after this many restarts (default: {MAX_RESTARTS_PER_FAULT}). "
+                             f"main.py itself has no limit, the container restarts forever")
+    parser.add_argument('--slow-delay', type=float, default=SLOW_PAGE_DELAY_SECONDS,
+                        help=f"Render delay in seconds (before scaling) for 'slow_responses'; the loop tolerates "
+                             f"about 15s (default: {SLOW_PAGE_DELAY_SECONDS})")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="Per-run timeout in seconds (default: derived from the scaled extension check interval)")
+    parser.add_argument('--verbose', action='store_true', help="Show the INFO logs of the main loop")
+    args = parser.parse_args()
+
+    selected = [] # (name, persist_restarts)
+    for spec in [spec.strip() for spec in args.faults.split(',') if spec.strip()]:
+        name, _, persist = spec.partition(':')
+        if name not in FAULTS:
+            parser.error(f"Unknown fault: {name}")
+        if persist and not persist.isdigit():
+            parser.error(f"Invalid restart count in '{spec}'")
+        if persist and int(persist) > 0 and name not in SESSION_FAULTS:
+            parser.error(f"'{name}' can't persist across restarts (only {', '.join(SESSION_FAULTS)} can)")
+        default_persist = args.persist_restarts if name in SESSION_FAULTS else 0
+        selected.append((name, int(persist) if persist else default_persist))
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.timeout is None:
+        # Warm-up plus a few worst-case extension check periods and restarts
+        check_period = (main.CHECK_EXTENSION_INTERVAL_MINUTES * 60 + main.SCHEDULE_JITTER_SECONDS) * args.scale
+        args.timeout = 60 + (args.max_restarts + 1) * (check_period + main.RESTART_DELAY_SECONDS * args.scale)
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    harness_log.setLevel(logging.INFO)
+
+    results = {}
+    for name, persist in selected:
+        label = f"{name} (persists {persist})" if persist else name
+        results[label] = []
+        for run in range(1, args.repeat + 1):
+            harness_log.info(f"[{label}] Starting run {run}/{args.repeat} (timeout {args.timeout:.0f}s)...")
+            # Seed per fault and run so results don't depend on which other faults were selected
+            seed = f"{args.seed}:{name}:{run}"
+            results[label].append(run_trial(name, args.scale, args.timeout, seed, jitter=not args.no_jitter,
+                                            persist_restarts=persist, max_restarts=args.max_restarts,
+                                            slow_delay=args.slow_delay))
+    print_report(results, args.scale, args.seed, not args.no_jitter, args.repeat)
+    return all(trial.passed for trials in results.values() for trial in trials)
+
+
+# --- Entry Point ---
+if __name__ == "__main__":
+    exit(0 if main_cli() else 1)
@@ -19,23 +19,29 @@ from dotenv import load_dotenv
 # --- Global Settings ---
 logging.basicConfig(level=logging.INFO,format='%(asctime)s UTC - %(levelname)s - %(message)s',datefmt='%Y-%m-%d %H:%M:%S')
 DOTENV_PATH = '/app/config/.env'
+EXTENSION_CRX_DIR = '/app' # Directory holding the downloaded <EXTENSION_ID>.crx
 # Define separate state files
 CLAIM_SCHEDULE_STATE_FILE = '/app/config/claim_schedule_state.json'
 EXTENSION_SCHEDULE_STATE_FILE = '/app/config/extension_schedule_state.json'
-DEFAULT_WAIT_TIMEOUT = 20
+DEFAULT_WAIT_TIMEOUT = 20 # Default timeout for wait_for_element
 CHECK_CLAIM_INTERVAL_MINUTES = 300 # 5 hours
 CHECK_EXTENSION_INTERVAL_MINUTES = 5 # 5 minutes
 MAIN_LOOP_SLEEP_SECONDS = 30 # Sleep between main loop iterations
+MIN_LOOP_SLEEP_SECONDS = 5 # Lower bound for the main loop sleep
+SCHEDULE_JITTER_SECONDS = 180 # Random +/- offset applied to scheduled checks
 RESTART_DELAY_SECONDS = 10 # Delay if restart container is needed
 CONNECTING_WAIT_TIMEOUT_SECONDS = 45 # Wait for 'Connecting...' to resolve
-SHORT_WAIT = 5 # Pause seconds for processing
-MEDIUM_WAIT = 10 # Pause seconds for processing
-LONG_WAIT = 20 # Pause seconds for processing
+SHORT_WAIT = 5 # Pause/timeout seconds for processing (also check_element_exists default)
+MEDIUM_WAIT = 10 # Pause/timeout seconds for processing
+LONG_WAIT = 20 # Pause/timeout seconds for processing
+CLAIM_BUTTON_WAIT_TIMEOUT = 15 # Wait for the 'Claim' button once it has been seen
+CLICK_PAUSE_RANGE_SECONDS = (0.5, 1.5) # Random pause after scrolling to the 'Claim' button
 
 # --- Essential Helper Functions ---
 
-def wait_for_element(driver, by, value, timeout=DEFAULT_WAIT_TIMEOUT):
-    """Waits for an element to be present and returns it."""
+def wait_for_element(driver, by, value, timeout=None):
+    """Waits for an element to be present and returns it (timeout defaults to DEFAULT_WAIT_TIMEOUT)."""
+    if timeout is None: timeout = DEFAULT_WAIT_TIMEOUT
     try:
         element = WebDriverWait(driver, timeout).until(
             EC.presence_of_element_located((by, value))
@@ -45,8 +51,9 @@ def wait_for_element(driver, by, value, timeout=DEFAULT_WAIT_TIMEOUT):
         logging.error(f"Timeout waiting for element: {by}={value} at URL {driver.current_url}")
         raise
 
-def check_element_exists(driver, by, value, timeout=5):
-    """Checks if an element exists without raising an error if not found."""
+def check_element_exists(driver, by, value, timeout=None):
+    """Checks if an element exists without raising an error if not found (timeout defaults to SHORT_WAIT)."""
+    if timeout is None: timeout = SHORT_WAIT
     try:
         WebDriverWait(driver, timeout).until(
             EC.presence_of_element_located((by, value))
@@ -69,15 +76,15 @@ def get_os_info():
 def click_claim_button(driver, claim_button_xpath):
     """Tries to find and click the 'Claim' button."""
     logging.info("Checking for the 'Claim' button existence...")
-    if check_element_exists(driver, By.XPATH, claim_button_xpath, timeout=10):
+    if check_element_exists(driver, By.XPATH, claim_button_xpath, timeout=MEDIUM_WAIT):
         logging.info("'Claim' button found!")
         try:
-            claim_button = wait_for_element(driver, By.XPATH, claim_button_xpath, timeout=15)
+            claim_button = wait_for_element(driver, By.XPATH, claim_button_xpath, timeout=CLAIM_BUTTON_WAIT_TIMEOUT)
             logging.info("Centering the 'Claim' button on the screen...")
             driver.execute_script("arguments[0].scrollIntoView({block: 'center', inline: 'nearest'});", claim_button)
-            time.sleep(random.uniform(0.5, 1.5))
+            time.sleep(random.uniform(*CLICK_PAUSE_RANGE_SECONDS))
 
-            claim_button_clickable = WebDriverWait(driver, 10).until(
+            claim_button_clickable = WebDriverWait(driver, MEDIUM_WAIT).until(
                 EC.element_to_be_clickable((By.XPATH, claim_button_xpath))
             )
             logging.info("Clicking the 'Claim' button...")
@@ -182,9 +189,9 @@ def activate_extension_if_needed(driver):
     logging.info("'Activated' not found, searching for activation buttons...")
     try:
         # Try clicking Login first
-        if check_element_exists(driver, By.XPATH, "//*[text()='Login']", timeout=5):
+        if check_element_exists(driver, By.XPATH, "//*[text()='Login']", timeout=SHORT_WAIT):
             logging.info("'Login' button found, clicking...")
-            login_button = wait_for_element(driver, By.XPATH, "//*[text()='Login']", timeout=5)
+            login_button = wait_for_element(driver, By.XPATH, "//*[text()='Login']", timeout=SHORT_WAIT)
             login_button.click()
             wait_for_element(driver, By.XPATH, "//*[text()='Activated']", timeout=LONG_WAIT)
             logging.info("Extension activated after clicking 'Login'.")
@@ -194,9 +201,9 @@ def activate_extension_if_needed(driver):
 
     try:
         # Try clicking Activate as a fallback
-        if check_element_exists(driver, By.XPATH, "//*[text()='Activate']", timeout=5):
+        if check_element_exists(driver, By.XPATH, "//*[text()='Activate']", timeout=SHORT_WAIT):
             logging.info("'Activate' button found, clicking...")
-            activate_button = wait_for_element(driver, By.XPATH, "//*[text()='Activate']", timeout=5)
+            activate_button = wait_for_element(driver, By.XPATH, "//*[text()='Activate']", timeout=SHORT_WAIT)
             activate_button.click()
             wait_for_element(driver, By.XPATH, "//*[text()='Activated']", timeout=LONG_WAIT)
             logging.info("Extension activated after clicking 'Activate'.")
@@ -284,7 +291,7 @@ def run_nodepay():
     if not extension_id or not extension_url:
         logging.error("EXTENSION_ID or EXTENSION_URL not defined.")
         return False
-    extension_crx_path = f'/app/{extension_id}.crx'
+    extension_crx_path = os.path.join(EXTENSION_CRX_DIR, f'{extension_id}.crx')
     extension_internal_page = f'chrome-extension://{extension_id}/index.html'
     dashboard_url = f"{extension_url}dashboard"
     claim_button_xpath = "//div[contains(@class, 'cursor-pointer') and contains(@class, 'bg-[#58CC02]')][.//div[contains(text(), 'Claim')]]"
@@ -315,7 +322,7 @@ def run_nodepay():
 
         # Define the main working tab
         try:
-            WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) >= 1)
+            WebDriverWait(driver, MEDIUM_WAIT).until(lambda d: len(d.window_handles) >= 1)
             handles = driver.window_handles
             driver.switch_to.new_window('tab')
             driver.get("about:blank")
@@ -524,7 +531,7 @@ def run_nodepay():
                          return False
 
                     # Schedule next check
-                    next_claim_check_time = time.time() + (CHECK_CLAIM_INTERVAL_MINUTES * 60) + random.uniform(-180, 180)
+                    next_claim_check_time = time.time() + (CHECK_CLAIM_INTERVAL_MINUTES * 60) + random.uniform(-SCHEDULE_JITTER_SECONDS, SCHEDULE_JITTER_SECONDS)
                     logging.info(f"Next Claim check scheduled for: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_claim_check_time))}")
                     logging.info("-" * 30)
 
@@ -604,7 +611,7 @@ def run_nodepay():
                     return False # Signal failure
 
                 # Schedule the next extension check
-                next_extension_check_time = time.time() + (CHECK_EXTENSION_INTERVAL_MINUTES * 60) + random.uniform(-180, 180)
+                next_extension_check_time = time.time() + (CHECK_EXTENSION_INTERVAL_MINUTES * 60) + random.uniform(-SCHEDULE_JITTER_SECONDS, SCHEDULE_JITTER_SECONDS)
                 logging.info(f"Next Extension check scheduled for: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_extension_check_time))}")
                 logging.info("-" * 30)
 
@@ -612,10 +619,10 @@ def run_nodepay():
             try:
                 time_to_next_claim = next_claim_check_time - current_time
                 time_to_next_extension = next_extension_check_time - current_time
-                sleep_duration = max(5, min(time_to_next_claim, time_to_next_extension, MAIN_LOOP_SLEEP_SECONDS))
+                sleep_duration = max(MIN_LOOP_SLEEP_SECONDS, min(time_to_next_claim, time_to_next_extension, MAIN_LOOP_SLEEP_SECONDS))
                 time.sleep(sleep_duration)
             except ValueError:
-                time.sleep(5)
+                time.sleep(MIN_LOOP_SLEEP_SECONDS)
 
     except KeyboardInterrupt:
         logging.info("Keyboard interrupt received. Saving state before exiting...")